@@ -0,0 +1,91 @@
+"""동시 임베딩 요청을 하나의 배치로 묶는 비동기 마이크로 배처"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from typing import TYPE_CHECKING, List, Tuple
+
+# numpy는 embedding_model이 스레드 환경변수를 설정한 뒤에 로드되어야 하므로 타입 검사용으로만 import한다.
+from embedding_model import EmbeddingModel
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """짧은 시간 창 안에 들어온 단일 텍스트 요청을 모아 encode_batch 한 번으로 처리한다."""
+
+    MAX_BATCH = 32
+    MAX_WAIT_MS = 8
+
+    def __init__(self, model: EmbeddingModel) -> None:
+        self._model = model
+        self._queue: asyncio.Queue[Tuple[str, asyncio.Future]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """백그라운드 배칭 태스크를 시작한다."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                "임베딩 배처 시작 (max_batch=%d, max_wait=%dms)",
+                self.MAX_BATCH,
+                self.MAX_WAIT_MS,
+            )
+
+    async def stop(self) -> None:
+        """배칭 태스크를 종료하고 대기 중인 요청을 취소한다."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def submit(self, text: str) -> np.ndarray:
+        """텍스트를 큐에 넣고 배치 인코딩 결과를 기다린다."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """첫 요청 도착 후 MAX_WAIT_MS 동안 최대 MAX_BATCH개를 모은다."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.MAX_WAIT_MS / 1000
+        while len(batch) < self.MAX_BATCH:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self._model.aencode_batch(texts)
+            except Exception as e:
+                logger.error("배치 인코딩 실패 (size=%d): %s", len(batch), e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
@@ -2,48 +2,308 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import hashlib
 import logging
-from typing import List
+import math
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+# OpenMP 스레드 수는 torch/numpy import 전에 정해져야 한다.
+NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", os.cpu_count() or 1))
+os.environ.setdefault("OMP_NUM_THREADS", str(NUM_THREADS))
+# Numba 병렬 커널은 workqueue 레이어로 실행한다: tbb는 메인 이외 스레드(인코딩 스레드)에서 호출하면
+# 종료 시 멈추고, GNU OpenMP는 fork 후 사용할 수 없다. workqueue는 동시 호출에 안전하지 않으므로
+# 커널은 EmbeddingModel의 단일 인코딩 스레드에서만 호출한다.
+os.environ.setdefault("NUMBA_THREADING_LAYER", "workqueue")
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+from filelock import FileLock  # noqa: E402
+from numba import njit, prange  # noqa: E402
+
+torch.set_num_threads(NUM_THREADS)
+torch.set_num_interop_threads(2)
 
 logger = logging.getLogger(__name__)
 
 
+@njit(parallel=True, fastmath=True, cache=True)
+def _l2_normalize_rows(x: np.ndarray) -> None:
+    """float32 행렬의 각 행을 제자리에서 L2 정규화한다 (행마다 한 번 합산, 한 번 스케일)."""
+    for i in prange(x.shape[0]):
+        s = 0.0
+        for j in range(x.shape[1]):
+            s += x[i, j] * x[i, j]
+        if s > 0.0:
+            inv = 1.0 / math.sqrt(s)
+            for j in range(x.shape[1]):
+                x[i, j] *= inv
+
+
+def _text_key(text: str) -> bytes:
+    """임베딩 캐시 키: 텍스트 바이트의 blake2b-128 해시."""
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
 class EmbeddingModel:
-    """dragonkue/BGE-m3-ko 모델을 싱글톤으로 로드하고 텍스트를 1024차원 벡터로 변환한다."""
+    """dragonkue/BGE-m3-ko 모델을 싱글톤으로 로드하고 텍스트를 1024차원 벡터로 변환한다.
+
+    기본 백엔드는 INT8 동적 양자화된 ONNX Runtime 모델이다.
+    EMBED_BACKEND=torch 로 설정하면 PyTorch 모델을 그대로 사용하며,
+    EMBED_DTYPE(fp32/fp16/bf16)으로 forward pass 정밀도를 고를 수 있다.
+    torch 백엔드는 SDPA attention을 사용하고 EMBED_COMPILE=1(기본)이면 torch.compile을 적용한다.
+    동일 텍스트의 임베딩은 최대 EMBED_CACHE_SIZE개까지 LRU 캐시에 보관한다.
+    """
 
     _instance: EmbeddingModel | None = None
     _model = None
+    _autocast: tuple | None = None  # (device_type, dtype)
+    _warmed_up = False
     DIMENSION = 1024
     MODEL_NAME = "dragonkue/BGE-m3-ko"
+    BACKEND = os.getenv("EMBED_BACKEND", "onnx")
+    DTYPE = os.getenv("EMBED_DTYPE", "fp32")
+    COMPILE = os.getenv("EMBED_COMPILE", "1") == "1"
+    ONNX_CACHE_DIR = os.getenv("EMBED_ONNX_CACHE_DIR", ".onnx_cache")
+    ONNX_QUANTIZED_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+    ENCODE_BATCH_SIZE = 32
+    CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "50000"))
 
     @classmethod
-    def get_instance(cls) -> EmbeddingModel:
+    def get_instance(cls, warmup: bool = True) -> EmbeddingModel:
+        """싱글톤을 반환한다. warmup=False면 가중치만 로드하고 워밍업은 다음 호출로 미룬다.
+
+        gunicorn 마스터에서는 warmup=False로 로드해야 한다: 워밍업이 실행하는 Numba/OpenMP
+        병렬 커널의 스레드 풀은 fork 후 자식 프로세스에서 사용할 수 없다.
+        """
         if cls._instance is None:
             cls._instance = cls()
+        if warmup and not cls._warmed_up:
+            cls._instance._executor().submit(cls._instance._warmup).result()
         return cls._instance
 
+    @classmethod
+    def is_preloaded(cls) -> bool:
+        """현재 프로세스(또는 fork 이전 마스터)에서 이미 모델이 로드되었는지 확인한다."""
+        return cls._instance is not None
+
+    def __reduce__(self):
+        # 가중치/락을 직렬화하지 않고, 역직렬화하는 프로세스의 싱글톤을 사용한다.
+        return (EmbeddingModel.get_instance, ())
+
     def __init__(self) -> None:
+        self._cache: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        # 인코딩은 단일 스레드에서만 실행한다: 이벤트 루프를 막지 않으면서 torch/ORT를 재진입하지 않는다.
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+
         if EmbeddingModel._model is None:
-            logger.info("임베딩 모델 로딩 중: %s", self.MODEL_NAME)
+            logger.info("임베딩 모델 로딩 중: %s (backend=%s)", self.MODEL_NAME, self.BACKEND)
             try:
-                from sentence_transformers import SentenceTransformer
-
-                EmbeddingModel._model = SentenceTransformer(self.MODEL_NAME)
+                if self.BACKEND == "onnx":
+                    EmbeddingModel._model = self._load_onnx()
+                else:
+                    EmbeddingModel._model = self._load_torch()
                 logger.info("임베딩 모델 로딩 완료 (dim=%d)", self.DIMENSION)
             except Exception as e:
                 logger.error("임베딩 모델 로딩 실패: %s", e)
                 raise
 
+    def _load_torch(self):
+        """PyTorch 모델을 로드하고 EMBED_DTYPE에 따라 반정밀도를 설정한다."""
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(
+            self.MODEL_NAME,
+            model_kwargs={"attn_implementation": "sdpa"},
+        )
+        device = model.device.type
+
+        if self.DTYPE == "fp16" and device == "cuda":
+            model.half()
+        elif self.DTYPE == "bf16":
+            if device == "cpu":
+                torch.set_float32_matmul_precision("medium")
+            EmbeddingModel._autocast = (device, torch.bfloat16)
+        elif self.DTYPE != "fp32":
+            logger.warning("EMBED_DTYPE=%s는 %s에서 지원하지 않음 - fp32 사용", self.DTYPE, device)
+
+        if self.COMPILE:
+            # 패딩 길이가 요청마다 달라 CUDA graph(reduce-overhead)는 재기록이 잦으므로 기본 모드 사용
+            model[0].auto_model.compile(dynamic=True)
+
+        logger.info("PyTorch 모델 정밀도: %s (device=%s, compile=%s)", self.DTYPE, device, self.COMPILE)
+        return model
+
+    def _load_onnx(self):
+        """INT8 양자화된 ONNX 모델을 로드한다. 캐시가 없으면 최초 1회 export + 양자화한다."""
+        import onnxruntime as ort
+        from sentence_transformers import SentenceTransformer
+
+        if self.DTYPE != "fp32":
+            logger.warning("ONNX 백엔드는 INT8 양자화 모델을 사용하므로 EMBED_DTYPE=%s 무시", self.DTYPE)
+
+        cache_dir = Path(self.ONNX_CACHE_DIR).resolve()
+        if not (cache_dir / self.ONNX_QUANTIZED_FILE).exists():
+            cache_dir.parent.mkdir(parents=True, exist_ok=True)
+            # 여러 워커가 동시에 기동해도 한 프로세스만 export하고, 나머지는 완료를 기다린다.
+            with FileLock(f"{cache_dir}.lock"):
+                if not (cache_dir / self.ONNX_QUANTIZED_FILE).exists():
+                    self._export_onnx(cache_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = NUM_THREADS
+
+        return SentenceTransformer(
+            str(cache_dir),
+            backend="onnx",
+            model_kwargs={
+                "file_name": self.ONNX_QUANTIZED_FILE,
+                "session_options": options,
+            },
+        )
+
+    def _export_onnx(self, cache_dir: Path) -> None:
+        """임시 디렉터리에 export + 양자화한 뒤 cache_dir로 원자적으로 교체한다.
+
+        중간에 실패해도 cache_dir에는 완성된 결과만 남는다. 호출자가 파일 락을 잡고 있어야 한다.
+        """
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        logger.info("ONNX export 및 INT8 양자화 중 (최초 1회): %s", cache_dir)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f"{cache_dir.name}.", dir=cache_dir.parent))
+        try:
+            exported = SentenceTransformer(self.MODEL_NAME, backend="onnx")
+            exported.save_pretrained(str(tmp_dir))
+            export_dynamic_quantized_onnx_model(exported, "avx512_vnni", str(tmp_dir))
+            # 이전 버전이 제자리에 쓰다 남긴 불완전한 캐시는 버린다.
+            if cache_dir.exists():
+                shutil.rmtree(cache_dir)
+            os.replace(tmp_dir, cache_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _warmup(self) -> None:
+        """길이가 다른 입력으로 미리 인코딩해 컴파일/세션 초기화를 기동 시점에 끝낸다 (인코딩 스레드에서 실행)."""
+        logger.info("임베딩 모델 워밍업 중")
+        self._encode(["워밍업"])
+        self._encode(["워밍업 문장입니다. " * 64, "짧은 문장"])
+        EmbeddingModel._warmed_up = True
+
     @property
     def is_loaded(self) -> bool:
         return self._model is not None
 
-    def encode(self, text: str) -> List[float]:
-        """단일 텍스트를 1024차원 벡터로 인코딩한다."""
-        vector = self._model.encode(text, normalize_embeddings=True)
-        return vector.tolist()
+    def _precision(self):
+        """EMBED_DTYPE=bf16이면 autocast 컨텍스트를, 아니면 빈 컨텍스트를 반환한다."""
+        if self._autocast is None:
+            return contextlib.nullcontext()
+        device, dtype = self._autocast
+        return torch.autocast(device, dtype=dtype)
+
+    def encode(self, text: str) -> np.ndarray:
+        """단일 텍스트를 1024차원 float16 벡터로 인코딩한다."""
+        return self.encode_batch([text])[0]
+
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """여러 텍스트를 인코딩 스레드에서 배치로 인코딩하고 끝날 때까지 기다린다.
+
+        반환값은 Milvus FLOAT16_VECTOR 필드에 그대로 넣을 수 있는 (len(texts), 1024) float16 배열이다.
+        """
+        return self._executor().submit(self._encode_cached, texts).result()
+
+    def cache_info(self) -> Dict[str, Any]:
+        """임베딩 캐시 크기와 적중률을 반환한다."""
+        lookups = self._cache_hits + self._cache_misses
+        return {
+            "size": len(self._cache),
+            "max_size": self.CACHE_SIZE,
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "hit_rate": self._cache_hits / lookups if lookups else 0.0,
+        }
+
+    def _executor(self) -> ThreadPoolExecutor:
+        """인코딩 스레드 풀을 반환한다. close() 이후에는 새로 만든다."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+            return self._pool
+
+    def close(self) -> None:
+        """인코딩 스레드를 종료한다. 이후 인코딩 요청이 오면 풀을 다시 만든다."""
+        with self._pool_lock:
+            # 락을 쥔 채 기다려 새 풀이 이전 스레드와 동시에 돌지 않게 한다.
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    async def aencode_batch(self, texts: List[str]) -> np.ndarray:
+        """encode_batch와 같지만 이벤트 루프를 막지 않고 인코딩 스레드의 결과를 기다린다."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(), self._encode_cached, texts)
+
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        """캐시에 있는 텍스트는 건너뛰고 나머지만 인코딩한다. 인코딩 스레드에서만 호출한다."""
+        if self.CACHE_SIZE <= 0:
+            return self._encode(texts)
+
+        out = np.empty((len(texts), self.DIMENSION), dtype=np.float16)
+        misses: Dict[bytes, List[int]] = {}
+        with self._cache_lock:
+            for i, text in enumerate(texts):
+                key = _text_key(text)
+                cached = self._cache.get(key)
+                if cached is None:
+                    misses.setdefault(key, []).append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    out[i] = cached
+            # 배치 안의 중복 텍스트는 한 번만 인코딩하므로 고유 키당 한 번만 miss로 센다.
+            self._cache_hits += len(texts) - len(misses)
+            self._cache_misses += len(misses)
+
+        if not misses:
+            return out
+
+        vectors = self._encode([texts[indices[0]] for indices in misses.values()])
+        with self._cache_lock:
+            for (key, indices), vector in zip(misses.items(), vectors):
+                out[indices] = vector
+                self._cache[key] = vector.copy()
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return out
+
+    @torch.inference_mode()
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """캐시를 거치지 않고 텍스트를 인코딩한다. 인코딩 스레드에서만 호출한다.
 
-    def encode_batch(self, texts: List[str]) -> List[List[float]]:
-        """여러 텍스트를 배치로 인코딩한다."""
-        vectors = self._model.encode(texts, normalize_embeddings=True)
-        return [v.tolist() for v in vectors]
+        SentenceTransformer.encode는 입력을 길이순으로 정렬해 ENCODE_BATCH_SIZE 단위로
+        나눠 인코딩한 뒤 원래 순서로 되돌리므로, 길이가 비슷한 텍스트끼리 패딩된다.
+        """
+        if not texts:
+            return np.empty((0, self.DIMENSION), dtype=np.float16)
+        with self._precision():
+            vectors = self._model.encode(
+                texts,
+                batch_size=self.ENCODE_BATCH_SIZE,
+                normalize_embeddings=False,
+                convert_to_numpy=True,
+            )
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        _l2_normalize_rows(vectors)
+        return vectors.astype(np.float16)
@@ -8,10 +8,15 @@ from typing import Any, Dict, List
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 
-from embedding_model import EmbeddingModel
-from milvus_manager import MilvusManager
-from schemas import (
+# embedding_model은 import 시점에 스레드/백엔드 환경변수를 읽으므로 먼저 .env를 로드한다.
+load_dotenv()
+
+from batcher import EmbeddingBatcher  # noqa: E402
+from embedding_model import EmbeddingModel  # noqa: E402
+from milvus_manager import BinaryIndexMissingError, MilvusManager  # noqa: E402
+from schemas import (  # noqa: E402
     CollectionCreateRequest,
     CollectionResponse,
     EmbedBatchRequest,
@@ -21,7 +26,6 @@ from schemas import (
     InsertRequest,
     InsertResponse,
     SearchByVectorRequest,
-    SearchHit,
     SearchRequest,
     SearchResponse,
 )
@@ -33,21 +37,32 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """앱 시작/종료 시 모델 로드 및 Milvus 연결을 관리한다."""
-    load_dotenv()
-
     # 시작: 모델 로드 + Milvus 연결
     logger.info("임베딩 서비스 시작 중...")
+    if EmbeddingModel.is_preloaded():
+        # gunicorn -c preload.py 로 마스터에서 로드한 가중치를 fork 후 COW로 공유하고,
+        # 워밍업은 아래 get_instance()에서 이 워커 프로세스 안에서 수행한다.
+        logger.info("사전 로드된 임베딩 모델 재사용")
     app.state.model = EmbeddingModel.get_instance()
     app.state.milvus = await MilvusManager.get_instance()
+    app.state.batcher = EmbeddingBatcher(app.state.model)
+    app.state.batcher.start()
     logger.info("임베딩 서비스 준비 완료")
 
     yield
 
     # 종료
+    await app.state.batcher.stop()
+    app.state.model.close()
     logger.info("임베딩 서비스 종료")
 
 
-app = FastAPI(title="Embedding Service", version="1.0", lifespan=lifespan)
+app = FastAPI(
+    title="Embedding Service",
+    version="1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 # ── 헬스체크 ──
@@ -71,6 +86,7 @@ async def health() -> Dict[str, Any]:
             "loaded": model_ok,
             "name": EmbeddingModel.MODEL_NAME,
             "dimension": EmbeddingModel.DIMENSION,
+            "cache": app.state.model.cache_info(),
         },
         "milvus": {
             "connected": milvus_ok,
@@ -81,24 +97,30 @@ async def health() -> Dict[str, Any]:
 
 # ── 임베딩 ──
 
+# 임베딩/검색 응답은 ORJSONResponse를 직접 반환해 response_model 재검증과 리스트 변환을 생략한다.
+
 @app.post("/embed", response_model=EmbedResponse)
-async def embed(req: EmbedRequest) -> EmbedResponse:
+async def embed(req: EmbedRequest) -> ORJSONResponse:
     """단일 텍스트를 임베딩 벡터로 변환한다."""
-    vector = app.state.model.encode(req.text)
-    return EmbedResponse(embedding=vector, dimension=EmbeddingModel.DIMENSION)
+    if not req.text.strip():
+        raise HTTPException(status_code=400, detail="text가 비어있습니다.")
+    vector = await app.state.batcher.submit(req.text)
+    return ORJSONResponse({"embedding": vector, "dimension": EmbeddingModel.DIMENSION})
 
 
 @app.post("/embed/batch", response_model=EmbedBatchResponse)
-async def embed_batch(req: EmbedBatchRequest) -> EmbedBatchResponse:
+async def embed_batch(req: EmbedBatchRequest) -> ORJSONResponse:
     """여러 텍스트를 배치로 임베딩한다."""
     if not req.texts:
         raise HTTPException(status_code=400, detail="texts 배열이 비어있습니다.")
-    vectors = app.state.model.encode_batch(req.texts)
-    return EmbedBatchResponse(
-        embeddings=vectors,
-        dimension=EmbeddingModel.DIMENSION,
-        count=len(vectors),
-    )
+    if any(not text.strip() for text in req.texts):
+        raise HTTPException(status_code=400, detail="texts에 빈 문자열이 있습니다.")
+    vectors = await app.state.model.aencode_batch(req.texts)
+    return ORJSONResponse({
+        "embeddings": vectors,
+        "dimension": EmbeddingModel.DIMENSION,
+        "count": len(vectors),
+    })
 
 
 # ── 컬렉션 관리 ──
@@ -110,6 +132,8 @@ async def create_collection(req: CollectionCreateRequest) -> CollectionResponse:
         name=req.name,
         dim=req.dimension,
         description=req.description,
+        index_type=req.index_type,
+        binary_index=req.binary_index,
     )
     return CollectionResponse(**result)
 
@@ -134,27 +158,35 @@ async def drop_collection(name: str) -> CollectionResponse:
 async def insert(name: str, req: InsertRequest) -> InsertResponse:
     """벡터 + 메타데이터를 컬렉션에 삽입한다.
 
-    auto_embed=True이면 text를 자동으로 임베딩하여 삽입한다.
+    auto_embed=True이면 embedding이 없는 item의 text만 모아 한 번에 임베딩한다.
     auto_embed=False이면 각 item에 embedding 필드가 필수다.
     """
-    data = []
-    for item in req.items:
-        if req.auto_embed:
-            embedding = app.state.model.encode(item.text)
-        else:
-            if item.embedding is None:
-                raise HTTPException(
-                    status_code=400,
-                    detail="auto_embed=False일 때 각 item에 embedding이 필요합니다.",
-                )
-            embedding = item.embedding
-
-        data.append({
+    if not req.auto_embed and any(item.embedding is None for item in req.items):
+        raise HTTPException(
+            status_code=400,
+            detail="auto_embed=False일 때 각 item에 embedding이 필요합니다.",
+        )
+
+    embeddings: List[Any] = [item.embedding for item in req.items]
+    to_embed_indices = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if to_embed_indices:
+        # 요청 자체가 배치이므로 배처 큐를 거치지 않고 한 번의 forward pass로 인코딩한다.
+        to_embed_texts = [req.items[i].text for i in to_embed_indices]
+        if any(not text.strip() for text in to_embed_texts):
+            raise HTTPException(status_code=400, detail="임베딩할 item의 text가 비어있습니다.")
+        vectors = await app.state.model.aencode_batch(to_embed_texts)
+        for i, vector in zip(to_embed_indices, vectors):
+            embeddings[i] = vector
+
+    data = [
+        {
             "text": item.text,
             "category": item.category,
             "metadata": item.metadata,
             "embedding": embedding,
-        })
+        }
+        for item, embedding in zip(req.items, embeddings)
+    ]
 
     result = await app.state.milvus.insert(collection_name=name, data=data)
     return InsertResponse(insert_count=result["insert_count"])
@@ -162,10 +194,27 @@ async def insert(name: str, req: InsertRequest) -> InsertResponse:
 
 # ── 검색 ──
 
+def _search_response(results: List[Any]) -> ORJSONResponse:
+    """Milvus 검색 결과를 SearchResponse 형태로 한 번에 변환한다 (Pydantic 재검증 생략)."""
+    hits = [
+        {
+            "id": hit["id"],
+            "distance": hit["distance"],
+            "text": hit["entity"].get("text", ""),
+            "category": hit["entity"].get("category", ""),
+            "metadata": hit["entity"].get("metadata", {}),
+        }
+        for hit in (results[0] if results else [])
+    ]
+    return ORJSONResponse({"results": hits, "count": len(hits)})
+
+
 @app.post("/collection/{name}/search", response_model=SearchResponse)
-async def search(name: str, req: SearchRequest) -> SearchResponse:
+async def search(name: str, req: SearchRequest) -> ORJSONResponse:
     """텍스트로 유사도 검색한다. 자동으로 임베딩 후 KNN 검색."""
-    query_vector = app.state.model.encode(req.query)
+    if not req.query.strip():
+        raise HTTPException(status_code=400, detail="query가 비어있습니다.")
+    query_vector = await app.state.batcher.submit(req.query)
 
     try:
         results = await app.state.milvus.search(
@@ -173,27 +222,19 @@ async def search(name: str, req: SearchRequest) -> SearchResponse:
             query_vectors=[query_vector],
             limit=req.limit,
             output_fields=req.output_fields,
+            search_mode=req.search_mode,
+            oversample=req.oversample,
         )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except BinaryIndexMissingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    hits = []
-    if results:
-        for hit in results[0]:
-            entity = hit["entity"]
-            hits.append(SearchHit(
-                id=hit["id"],
-                distance=hit["distance"],
-                text=entity.get("text", ""),
-                category=entity.get("category", ""),
-                metadata=entity.get("metadata", {}),
-            ))
-
-    return SearchResponse(results=hits, count=len(hits))
+    return _search_response(results)
 
 
 @app.post("/collection/{name}/search/vector", response_model=SearchResponse)
-async def search_by_vector(name: str, req: SearchByVectorRequest) -> SearchResponse:
+async def search_by_vector(name: str, req: SearchByVectorRequest) -> ORJSONResponse:
     """벡터로 직접 유사도 검색한다."""
     try:
         results = await app.state.milvus.search(
@@ -201,20 +242,12 @@ async def search_by_vector(name: str, req: SearchByVectorRequest) -> SearchRespo
             query_vectors=[req.query_vector],
             limit=req.limit,
             output_fields=req.output_fields,
+            search_mode=req.search_mode,
+            oversample=req.oversample,
         )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except BinaryIndexMissingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    hits = []
-    if results:
-        for hit in results[0]:
-            entity = hit["entity"]
-            hits.append(SearchHit(
-                id=hit["id"],
-                distance=hit["distance"],
-                text=entity.get("text", ""),
-                category=entity.get("category", ""),
-                metadata=entity.get("metadata", {}),
-            ))
-
-    return SearchResponse(results=hits, count=len(hits))
+    return _search_response(results)
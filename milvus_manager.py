@@ -2,14 +2,64 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 from typing import Any, Dict, List, Optional
 
-from pymilvus import AsyncMilvusClient, DataType
+import numpy as np
+from pymilvus import AsyncMilvusClient, DataType, MilvusException
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_INDEX_TYPE = "HNSW_SQ"
+HNSW_BUILD_PARAMS = {"M": 18, "efConstruction": 256}
+# 호출마다 새 리스트를 만들지 않도록 공유한다 (pymilvus는 list 타입만 허용, 변경 금지).
+DEFAULT_OUTPUT_FIELDS = ["text", "category", "metadata"]
+BINARY_SEARCH_NPROBE = 16
+INSERT_CHUNK_SIZE = 512
+INSERT_CONCURRENCY = 8
+
+
+def _index_build_params(index_type: str, dim: int) -> Dict[str, Any]:
+    """인덱스 종류별 빌드 파라미터를 반환한다."""
+    if index_type == "HNSW":
+        return dict(HNSW_BUILD_PARAMS)
+    if index_type == "HNSW_SQ":
+        return {**HNSW_BUILD_PARAMS, "sq_type": "SQ8"}
+    if index_type == "HNSW_PQ":
+        # PQ 서브벡터 수 m은 dim의 약수여야 한다: dim // 8 이하에서 가장 큰 약수를 사용한다.
+        m = next(m for m in range(max(1, dim // 8), 0, -1) if dim % m == 0)
+        return {**HNSW_BUILD_PARAMS, "m": m, "nbits": 8}
+    return {}
+
+
+def _pack_sign_bits(vector: Any) -> bytes:
+    """벡터의 부호 비트(>0)를 1비트씩 패킹해 BINARY_VECTOR 값으로 만든다."""
+    return np.packbits(np.asarray(vector) > 0).tobytes()
+
+
+def _as_float16(value: Any) -> np.ndarray:
+    """검색 결과로 받은 FLOAT16_VECTOR 값(bytes 또는 [bytes])을 배열로 변환한다."""
+    if isinstance(value, list) and value and isinstance(value[0], (bytes, bytearray)):
+        value = b"".join(value)
+    if isinstance(value, (bytes, bytearray)):
+        return np.frombuffer(value, dtype=np.float16)
+    return np.asarray(value, dtype=np.float16)
+
+
+class BinaryIndexMissingError(Exception):
+    """binary_refine 검색을 요청했지만 컬렉션에 embedding_bin 필드가 없을 때 발생한다."""
+
+
+def _set_binary_rows(data: List[Dict[str, Any]], has_binary: bool) -> None:
+    """컬렉션 스키마에 맞게 각 행의 embedding_bin 값을 채우거나 제거한다."""
+    for row in data:
+        if has_binary:
+            row["embedding_bin"] = _pack_sign_bits(row["embedding"])
+        else:
+            row.pop("embedding_bin", None)
+
 
 class MilvusManager:
     """Milvus AsyncMilvusClient 싱글톤 래퍼."""
@@ -25,6 +75,7 @@ class MilvusManager:
 
     def __init__(self) -> None:
         self.client: AsyncMilvusClient | None = None
+        self._binary_fields: Dict[str, bool] = {}  # 컬렉션별 embedding_bin 필드 유무
 
     async def connect(self) -> None:
         """Milvus 서버에 비동기 연결한다."""
@@ -48,10 +99,18 @@ class MilvusManager:
         name: str,
         dim: int = 1024,
         description: str = "",
+        index_type: str = DEFAULT_INDEX_TYPE,
+        binary_index: bool = False,
     ) -> Dict[str, Any]:
-        """컬렉션을 생성한다. 이미 존재하면 스킵."""
+        """컬렉션을 생성한다. 이미 존재하면 스킵.
+
+        기본 인덱스는 HNSW_SQ(SQ8)로, FLOAT 원본 대비 메모리와 탐색 대역폭을 줄인다.
+        binary_index=True이면 1차 후보 검색용 1비트 부호 벡터 필드(embedding_bin)를 함께 만든다.
+        """
         collections = await self.client.list_collections()
         if name in collections:
+            # 다른 워커/클라이언트가 다시 만들었을 수 있으므로 캐시된 스키마 정보를 버린다.
+            self._binary_fields.pop(name, None)
             logger.info("컬렉션 '%s' 이미 존재함 - 스킵", name)
             return {"collection": name, "status": "already_exists"}
 
@@ -82,17 +141,32 @@ class MilvusManager:
         )
         schema.add_field(
             field_name="embedding",
-            datatype=DataType.FLOAT_VECTOR,
+            datatype=DataType.FLOAT16_VECTOR,
             dim=dim,
-            description=f"{dim}차원 임베딩 벡터",
+            description=f"{dim}차원 임베딩 벡터 (fp16)",
         )
+        if binary_index:
+            schema.add_field(
+                field_name="embedding_bin",
+                datatype=DataType.BINARY_VECTOR,
+                dim=dim,
+                description="임베딩 부호 비트 (HAMMING 1차 검색용)",
+            )
 
         index_params = self.client.prepare_index_params()
         index_params.add_index(
             field_name="embedding",
-            index_type="AUTOINDEX",
+            index_type=index_type,
             metric_type="COSINE",
+            params=_index_build_params(index_type, dim),
         )
+        if binary_index:
+            index_params.add_index(
+                field_name="embedding_bin",
+                index_type="BIN_IVF_FLAT",
+                metric_type="HAMMING",
+                params={"nlist": 128},
+            )
 
         await self.client.create_collection(
             collection_name=name,
@@ -101,7 +175,14 @@ class MilvusManager:
             description=description,
         )
 
-        logger.info("컬렉션 '%s' 생성 완료 (dim=%d)", name, dim)
+        self._binary_fields[name] = binary_index
+        logger.info(
+            "컬렉션 '%s' 생성 완료 (dim=%d, index=%s, binary=%s)",
+            name,
+            dim,
+            index_type,
+            binary_index,
+        )
         return {"collection": name, "status": "created"}
 
     async def insert(
@@ -109,58 +190,159 @@ class MilvusManager:
         collection_name: str,
         data: List[Dict[str, Any]],
     ) -> Dict[str, Any]:
-        """벡터 + 메타데이터를 컬렉션에 삽입한다. 컬렉션이 없으면 자동 생성."""
+        """벡터 + 메타데이터를 컬렉션에 삽입한다. 컬렉션이 없으면 자동 생성.
+
+        INSERT_CHUNK_SIZE행 단위로 나눠 최대 INSERT_CONCURRENCY개씩 병렬 전송한다.
+        청크 단위로 커밋되므로 중간에 실패하면 앞선 청크는 이미 삽입된 상태로 남는다.
+        다른 프로세스가 컬렉션을 다시 만들어 embedding_bin 유무가 바뀌었으면 스키마를 다시 읽어 한 번 재시도한다.
+        """
         collections = await self.client.list_collections()
         if collection_name not in collections:
             logger.info("컬렉션 '%s' 없음 - 자동 생성", collection_name)
             await self.create_collection(name=collection_name)
-        result = await self.client.insert(
-            collection_name=collection_name,
-            data=data,
-        )
-        logger.info(
-            "컬렉션 '%s'에 %d건 삽입 완료",
-            collection_name,
-            len(data),
-        )
-        return {"insert_count": len(data), "ids": result.get("ids", [])}
+        for row in data:
+            # 이미 float16 배열이면 복사 없이 그대로 사용된다.
+            row["embedding"] = np.asarray(row["embedding"], dtype=np.float16)
+        has_binary = await self._has_binary_field(collection_name)
+        _set_binary_rows(data, has_binary)
+
+        try:
+            ids = await self._insert_chunks(collection_name, data)
+        except MilvusException:
+            if await self._has_binary_field(collection_name, refresh=True) == has_binary:
+                raise
+            logger.warning("컬렉션 '%s'의 embedding_bin 유무 변경 감지 - 재시도", collection_name)
+            _set_binary_rows(data, not has_binary)
+            ids = await self._insert_chunks(collection_name, data)
+
+        logger.info("컬렉션 '%s'에 %d건 삽입 완료", collection_name, len(data))
+        return {"insert_count": len(data), "ids": ids}
+
+    async def _insert_chunks(
+        self,
+        collection_name: str,
+        data: List[Dict[str, Any]],
+    ) -> List[Any]:
+        """INSERT_CHUNK_SIZE행 단위로 나눠 병렬 삽입하고 id를 순서대로 모은다."""
+        semaphore = asyncio.Semaphore(INSERT_CONCURRENCY)
+
+        async def insert_chunk(chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.client.insert(collection_name=collection_name, data=chunk)
+
+        chunks = [
+            data[i:i + INSERT_CHUNK_SIZE] for i in range(0, len(data), INSERT_CHUNK_SIZE)
+        ]
+        results = await asyncio.gather(*(insert_chunk(chunk) for chunk in chunks))
+        return [id_ for result in results for id_ in result.get("ids", [])]
 
     async def search(
         self,
         collection_name: str,
-        query_vectors: List[List[float]],
+        query_vectors: List[Any],
         limit: int = 5,
         output_fields: Optional[List[str]] = None,
-    ) -> List[List[Dict[str, Any]]]:
-        """KNN 유사도 검색을 수행한다. 컬렉션이 없으면 ValueError 발생."""
+        search_mode: str = "dense",
+        oversample: int = 4,
+    ) -> List[Any]:
+        """KNN 유사도 검색을 수행한다. 컬렉션이 없으면 ValueError 발생.
+
+        쿼리별 hit 목록을 반환하며, 각 hit는 "id", "distance", "entity" 키로 접근한다.
+
+        search_mode="binary_refine"이면 embedding_bin(HAMMING)으로 limit*oversample개 후보를 뽑고,
+        후보의 fp16 벡터와 코사인 유사도로 재정렬해 상위 limit개를 반환한다.
+        컬렉션에 embedding_bin 필드가 없으면 BinaryIndexMissingError 발생.
+        """
         collections = await self.client.list_collections()
         if collection_name not in collections:
             raise ValueError(f"컬렉션 '{collection_name}'이 존재하지 않습니다.")
 
         if output_fields is None:
-            output_fields = ["text", "category", "metadata"]
+            output_fields = DEFAULT_OUTPUT_FIELDS
+
+        if search_mode == "binary_refine":
+            return await self._search_binary_refine(
+                collection_name, query_vectors, limit, output_fields, oversample
+            )
 
         results = await self.client.search(
             collection_name=collection_name,
-            data=query_vectors,
+            data=[np.asarray(v, dtype=np.float16) for v in query_vectors],
+            anns_field="embedding",  # binary_index 컬렉션은 벡터 필드가 둘이라 명시가 필요하다
             limit=limit,
             output_fields=output_fields,
-            search_params={"metric_type": "COSINE"},
+            # pymilvus가 search_params["params"]에 값을 쓸 수 있으므로 호출마다 새로 만든다.
+            search_params={"metric_type": "COSINE", "params": {"ef": max(64, limit * 4)}},
         )
 
+        # pymilvus Hit는 이미 dict처럼 접근 가능하므로 재구성하지 않고 그대로 반환한다.
+        return results
+
+    async def _search_binary_refine(
+        self,
+        collection_name: str,
+        query_vectors: List[Any],
+        limit: int,
+        output_fields: List[str],
+        oversample: int,
+    ) -> List[List[Dict[str, Any]]]:
+        """HAMMING 1차 검색 후 클라이언트에서 코사인 재정렬한다."""
+        # 캐시에 없음으로 기록돼 있어도 그 사이 다시 만들어졌을 수 있으므로 한 번 새로 확인한다.
+        if not (
+            await self._has_binary_field(collection_name)
+            or await self._has_binary_field(collection_name, refresh=True)
+        ):
+            raise BinaryIndexMissingError(
+                f"컬렉션 '{collection_name}'에 바이너리 인덱스(embedding_bin)가 없습니다."
+            )
+
+        queries = [np.asarray(v, dtype=np.float32) for v in query_vectors]
+        try:
+            # 후보 벡터를 1차 검색 결과로 함께 받아 별도 get 호출을 생략한다.
+            results = await self.client.search(
+                collection_name=collection_name,
+                data=[_pack_sign_bits(q) for q in queries],
+                anns_field="embedding_bin",
+                limit=limit * oversample,
+                output_fields=[*output_fields, "embedding"],
+                search_params={"metric_type": "HAMMING", "params": {"nprobe": BINARY_SEARCH_NPROBE}},
+            )
+        except MilvusException:
+            # 컬렉션이 embedding_bin 없이 다시 만들어졌을 수 있으므로 다음 요청에서 스키마를 다시 읽는다.
+            self._binary_fields.pop(collection_name, None)
+            raise
+
         formatted = []
-        for hits in results:
-            hit_list = []
-            for hit in hits:
-                hit_list.append({
-                    "id": hit["id"],
-                    "distance": float(hit["distance"]),
-                    "entity": hit["entity"],
-                })
-            formatted.append(hit_list)
+        for query, hits in zip(queries, results):
+            if not hits:
+                formatted.append([])
+                continue
+            entities = [hit["entity"] for hit in hits]
+            candidates = np.stack(
+                [_as_float16(entity.pop("embedding")) for entity in entities]
+            ).astype(np.float32)
+            norms = np.linalg.norm(candidates, axis=1) * (np.linalg.norm(query) or 1.0)
+            scores = candidates @ query / np.where(norms > 0, norms, 1.0)
+            top = np.argsort(-scores)[:limit]
+            formatted.append([
+                {"id": hits[i]["id"], "distance": float(scores[i]), "entity": entities[i]}
+                for i in top
+            ])
 
         return formatted
 
+    async def _has_binary_field(self, collection_name: str, refresh: bool = False) -> bool:
+        """컬렉션에 embedding_bin 필드가 있는지 확인한다.
+
+        결과는 캐시하며, 다른 프로세스가 컬렉션을 다시 만들었을 수 있을 때는 refresh=True로 다시 읽는다.
+        """
+        if refresh or collection_name not in self._binary_fields:
+            desc = await self.client.describe_collection(collection_name=collection_name)
+            self._binary_fields[collection_name] = any(
+                field["name"] == "embedding_bin" for field in desc.get("fields", [])
+            )
+        return self._binary_fields[collection_name]
+
     async def list_collections(self) -> List[str]:
         """모든 컬렉션 목록을 반환한다."""
         return await self.client.list_collections()
@@ -168,5 +350,6 @@ class MilvusManager:
     async def drop_collection(self, name: str) -> Dict[str, str]:
         """컬렉션을 삭제한다."""
         await self.client.drop_collection(collection_name=name)
+        self._binary_fields.pop(name, None)
         logger.info("컬렉션 '%s' 삭제 완료", name)
         return {"collection": name, "status": "dropped"}
@@ -0,0 +1,45 @@
+"""gunicorn 설정 - 마스터 프로세스에서 임베딩 모델을 미리 로드한다.
+
+    gunicorn -c preload.py main:app
+
+워커는 fork 후 가중치를 COW로 공유하므로 워커 수만큼 메모리/로딩 시간이 늘지 않는다.
+마스터는 가중치만 로드하고, 병렬 커널을 실행하는 워밍업은 fork 이후 각 워커의 lifespan에서 한다.
+ONNX Runtime 세션과 CUDA 컨텍스트는 fork 후 재사용할 수 없으므로 사전 로드는
+CPU torch 백엔드에서만 수행하고, 그 외에는 각 워커가 lifespan에서 모델을 로드한다.
+GPU 여부는 NVML로 판단해 마스터에서 CUDA 드라이버를 초기화하지 않고, 마스터는 intra-op 스레드
+1개로 로드해 torch OpenMP 풀이 fork 전에 생기지 않게 한 뒤 post_fork에서 스레드 수를 되돌린다.
+CPU 추론은 WEB_CONCURRENCY=1 + intra-op 스레드 + 배처 조합을 권장하고,
+GPU는 CUDA_VISIBLE_DEVICES로 GPU마다 프로세스를 하나씩 띄운다.
+"""
+
+import os
+
+# torch.cuda.is_available()이 cuInit 대신 NVML로 GPU를 확인하게 한다 (cuInit 후 fork한 워커는 CUDA 사용 불가)
+os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+preload_app = True
+
+
+def on_starting(server) -> None:
+    import torch
+
+    from embedding_model import EmbeddingModel
+
+    if EmbeddingModel.BACKEND == "torch" and not torch.cuda.is_available():
+        server.log.info("마스터 프로세스에서 임베딩 모델 사전 로드")
+        # 가중치 복사가 OpenMP 풀을 띄우지 않도록 마스터는 단일 스레드로 로드한다.
+        torch.set_num_threads(1)
+        EmbeddingModel.get_instance(warmup=False)
+    else:
+        server.log.info("fork 안전하지 않은 백엔드 - 워커별로 임베딩 모델 로드")
+
+
+def post_fork(server, worker) -> None:
+    import torch
+
+    from embedding_model import NUM_THREADS
+
+    torch.set_num_threads(NUM_THREADS)
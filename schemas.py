@@ -2,9 +2,21 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+
+# BGE-m3 입력 한도(512토큰)를 넘기에 충분한 글자 수. 초과분은 토크나이저에 넘기기 전에 자른다.
+MAX_TEXT_CHARS = 4096
+
+
+# Milvus topk 상한(16384) 이내: binary_refine은 limit * oversample개를 1차로 가져온다.
+MAX_SEARCH_LIMIT = 1024
+MAX_OVERSAMPLE = 16
+
+
+def _truncate(text: str) -> str:
+    return text[:MAX_TEXT_CHARS]
 
 
 # ── 임베딩 ──
@@ -12,18 +24,30 @@ from pydantic import BaseModel
 class EmbedRequest(BaseModel):
     text: str
 
+    @field_validator("text")
+    @classmethod
+    def truncate_text(cls, v: str) -> str:
+        return _truncate(v)
+
 
 class EmbedBatchRequest(BaseModel):
     texts: List[str]
 
+    @field_validator("texts")
+    @classmethod
+    def truncate_texts(cls, v: List[str]) -> List[str]:
+        return [_truncate(text) for text in v]
+
+
+# 임베딩 응답은 numpy float16 배열을 그대로 담는다 (orjson이 직접 직렬화, 검증 생략).
 
 class EmbedResponse(BaseModel):
-    embedding: List[float]
+    embedding: Any
     dimension: int
 
 
 class EmbedBatchResponse(BaseModel):
-    embeddings: List[List[float]]
+    embeddings: Any
     dimension: int
     count: int
 
@@ -34,6 +58,8 @@ class CollectionCreateRequest(BaseModel):
     name: str
     dimension: int = 1024
     description: str = ""
+    index_type: Literal["HNSW", "HNSW_SQ", "HNSW_PQ", "AUTOINDEX"] = "HNSW_SQ"
+    binary_index: bool = False
 
 
 class CollectionResponse(BaseModel):
@@ -49,6 +75,11 @@ class InsertItem(BaseModel):
     metadata: Dict[str, Any] = {}
     embedding: Optional[List[float]] = None
 
+    @field_validator("text")
+    @classmethod
+    def truncate_text(cls, v: str) -> str:
+        return _truncate(v)
+
 
 class InsertRequest(BaseModel):
     items: List[InsertItem]
@@ -63,14 +94,23 @@ class InsertResponse(BaseModel):
 
 class SearchRequest(BaseModel):
     query: str
-    limit: int = 5
+    limit: int = Field(5, ge=1, le=MAX_SEARCH_LIMIT)
     output_fields: Optional[List[str]] = None
+    search_mode: Literal["dense", "binary_refine"] = "dense"
+    oversample: int = Field(4, ge=1, le=MAX_OVERSAMPLE)
+
+    @field_validator("query")
+    @classmethod
+    def truncate_query(cls, v: str) -> str:
+        return _truncate(v)
 
 
 class SearchByVectorRequest(BaseModel):
     query_vector: List[float]
-    limit: int = 5
+    limit: int = Field(5, ge=1, le=MAX_SEARCH_LIMIT)
     output_fields: Optional[List[str]] = None
+    search_mode: Literal["dense", "binary_refine"] = "dense"
+    oversample: int = Field(4, ge=1, le=MAX_OVERSAMPLE)
 
 
 class SearchHit(BaseModel):
@@ -78,7 +118,7 @@ class SearchHit(BaseModel):
     distance: float
     text: str
     category: str
-    metadata: Dict[str, Any]
+    metadata: Any
 
 
 class SearchResponse(BaseModel):